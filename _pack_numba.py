@@ -0,0 +1,57 @@
+"""
+Best-fit-decreasing bin pack, compiled with Numba when it is available.
+
+The packing loop works on a flat array of residual stick capacities instead of
+re-summing Python lists, so it stays cheap for groups of hundreds of pieces.
+Without Numba the same kernel runs as plain Python.
+"""
+from __future__ import annotations
+
+from typing import List, Tuple
+
+import numpy as np
+
+try:
+    from numba import njit  # type: ignore
+except ModuleNotFoundError:  # pure-Python fallback, same results
+    def njit(*_args, **_kwargs):
+        def wrap(fn):
+            return fn
+        return wrap
+
+
+@njit(cache=True)
+def _bfd_assign(cuts_desc: np.ndarray, stick_len: float, kerf: float):
+    """Assign each (descending) cut to the tightest stick it fits on."""
+    n = cuts_desc.shape[0]
+    remaining = np.empty(n, dtype=np.float64)
+    assign = np.empty(n, dtype=np.int32)
+    nbins = 0
+    for i in range(n):
+        need = cuts_desc[i] + kerf
+        best = -1
+        best_res = np.inf
+        for j in range(nbins):
+            res = remaining[j]
+            if res >= need and res < best_res:
+                best = j
+                best_res = res
+        if best == -1:
+            remaining[nbins] = stick_len - cuts_desc[i]
+            assign[i] = nbins
+            nbins += 1
+        else:
+            remaining[best] -= need
+            assign[i] = best
+    return assign, remaining[:nbins]
+
+
+def best_fit_desc(cuts, stick_len: float, kerf: float) -> List[Tuple[List[float], float]]:
+    """Best-fit-descending bin pack. Returns [(pattern, drop_in), ...]."""
+    cuts_desc = np.sort(np.asarray(cuts, dtype=np.float64))[::-1].copy()
+    assign, remaining = _bfd_assign(cuts_desc, float(stick_len), float(kerf))
+
+    patterns: List[List[float]] = [[] for _ in range(len(remaining))]
+    for length, j in zip(cuts_desc.tolist(), assign.tolist()):
+        patterns[j].append(length)
+    return list(zip(patterns, remaining.tolist()))
@@ -1,16 +1,64 @@
+import atexit
+import hashlib
+import logging
 import os
+import shutil
 import tempfile
-import traceback
-from io import BytesIO
+import threading
+from collections import OrderedDict
 from pathlib import Path
 
 import uvicorn
 from fastapi import FastAPI, UploadFile, File, Form, HTTPException
-from fastapi.responses import StreamingResponse
+from fastapi.responses import FileResponse
+from starlette.background import BackgroundTask
 from starlette.middleware.cors import CORSMiddleware
 
 # Import your existing logic
 from cut_optimizer import optimise_cuts
+from cut_sheet_loader import load_cut_demand
+
+logger = logging.getLogger(__name__)
+
+UPLOAD_CHUNK_BYTES = 1 << 20
+XLSX_MEDIA_TYPE = "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"
+
+# Recent results keyed by (upload digest, kerf), so re-submitted workbooks skip
+# optimisation. Each worker process keeps its own cache.
+RESULT_CACHE_SIZE = 32
+_cache_dir = Path(tempfile.mkdtemp(prefix="cut_sheet_cache_"))
+atexit.register(shutil.rmtree, _cache_dir, ignore_errors=True)
+_result_cache: "OrderedDict[tuple[str, float], Path]" = OrderedDict()
+_cache_lock = threading.Lock()
+
+
+def _cache_get(key: tuple[str, float]) -> Path | None:
+    with _cache_lock:
+        path = _result_cache.get(key)
+        if path is not None:
+            _result_cache.move_to_end(key)
+        return path
+
+
+def _cache_put(key: tuple[str, float], output_path: Path) -> None:
+    fd, name = tempfile.mkstemp(suffix=".xlsx", dir=_cache_dir)
+    os.close(fd)
+    cached = Path(name)
+    shutil.copyfile(output_path, cached)
+    with _cache_lock:
+        if key in _result_cache:
+            # An overlapping miss already stored this result, and a cache hit may
+            # be serving that file; drop our copy instead of replacing it.
+            _result_cache.move_to_end(key)
+            evicted = [cached]
+        else:
+            _result_cache[key] = cached
+            evicted = []
+            while len(_result_cache) > RESULT_CACHE_SIZE:
+                evicted.append(_result_cache.popitem(last=False)[1])
+    for path in evicted:
+        path.unlink(missing_ok=True)
+
 
 app = FastAPI(
     title="Cut Sheet Optimizer",
@@ -41,8 +89,10 @@ def health():
     """Detailed health check for monitoring"""
     return {"status": "healthy", "timestamp": "2025-01-01T00:00:00Z"}
 
+# Plain `def`: the work below is blocking, so FastAPI runs it in its threadpool
+# instead of stalling the event loop.
 @app.post("/optimize")
-async def optimize_cut_sheet(
+def optimize_cut_sheet(
     file: UploadFile = File(..., description="Fabrication Summary Excel file"),
     kerf: float = Form(0.125, description="Saw blade width in inches"),
     return_name: str = Form("Cut_sheet.xlsx", description="Output filename"),
@@ -55,102 +105,92 @@ async def optimize_cut_sheet(
     - **return_name**: Name for output file (default: Cut_sheet.xlsx)
     """
     
-    print(f"=== DEBUG: Starting optimization ===")
-    print(f"File received: {file.filename}")
-    print(f"File content type: {file.content_type}")
-    print(f"Kerf: {kerf}")
-    print(f"Return name: {return_name}")
+    logger.debug(
+        "Starting optimization: file=%s content_type=%s kerf=%s return_name=%s",
+        file.filename, file.content_type, kerf, return_name,
+    )
     
     # Validate file type
     if not file.filename.endswith(('.xlsx', '.xlsm')):
-        print(f"ERROR: Invalid file type: {file.filename}")
+        logger.warning("Invalid file type: %s", file.filename)
         raise HTTPException(
             status_code=400, 
             detail="File must be Excel format (.xlsx or .xlsm)"
         )
     
-    with tempfile.TemporaryDirectory() as temp_dir:
+    temp_dir = tempfile.mkdtemp()
+    try:
+        temp_path = Path(temp_dir)
+        input_file = temp_path / file.filename
+        
+        # Save uploaded file in 1 MiB chunks rather than buffering it whole,
+        # hashing as we go for the result cache
+        digest = hashlib.blake2b(digest_size=16)
+        with input_file.open("wb") as f:
+            while chunk := file.file.read(UPLOAD_CHUNK_BYTES):
+                digest.update(chunk)
+                f.write(chunk)
+        logger.debug("Saved upload to %s (%d bytes)", input_file, input_file.stat().st_size)
+        
+        cache_key = (digest.hexdigest(), kerf)
+        cached = _cache_get(cache_key)
+        if cached is not None:
+            logger.debug("Cache hit: %s", cached)
+            return FileResponse(
+                str(cached),
+                media_type=XLSX_MEDIA_TYPE,
+                filename=return_name,
+                background=BackgroundTask(shutil.rmtree, temp_dir, ignore_errors=True),
+            )
+        
+        # Load data up front so parsing problems get their own error message
         try:
-            temp_path = Path(temp_dir)
-            input_file = temp_path / file.filename
-            
-            print(f"Temp directory: {temp_path}")
-            print(f"Input file path: {input_file}")
-            
-            # Save uploaded file
-            content = await file.read()
-            print(f"File content size: {len(content)} bytes")
-            
-            input_file.write_bytes(content)
-            print(f"File saved successfully: {input_file.exists()}")
-            print(f"Saved file size: {input_file.stat().st_size} bytes")
-            
-            # Test imports
-            try:
-                print("Testing imports...")
-                from cut_sheet_loader import load_cut_demand, STICK_LENGTHS
-                print("✓ cut_sheet_loader imported successfully")
-                print(f"STICK_LENGTHS defined: {len(STICK_LENGTHS)} combinations")
-                for key, value in STICK_LENGTHS.items():
-                    print(f"  {key}: {value}")
-            except Exception as import_error:
-                print(f"ERROR importing cut_sheet_loader: {import_error}")
-                raise HTTPException(status_code=500, detail=f"Import error: {import_error}")
-            
-            # Test data loading
-            try:
-                print("Testing data loading...")
-                tidy = load_cut_demand(input_file)
-                print(f"✓ Data loaded: {len(tidy)} rows")
-                print(f"Columns: {list(tidy.columns)}")
-                print(f"First few rows:\n{tidy.head()}")
-                print(f"Unique materials: {tidy['Material'].unique()}")
-                print(f"Unique diameters: {sorted(tidy['diameter_in'].unique())}")
-                print(f"Rows per tab:\n{tidy.groupby('tab').size()}")
-            except Exception as load_error:
-                print(f"ERROR loading data: {load_error}")
-                print(f"Traceback: {traceback.format_exc()}")
-                raise HTTPException(status_code=400, detail=f"Data loading error: {load_error}")
-            
-            # Run optimization
-            print("Running optimization...")
-            output_path = optimise_cuts(input_file, kerf=kerf)
-            print(f"✓ Optimization completed: {output_path}")
-            
-            if not output_path.exists():
-                print(f"ERROR: Output file does not exist: {output_path}")
-                raise HTTPException(
-                    status_code=500, 
-                    detail="Optimization failed - no output generated"
-                )
-            
-            print(f"Output file size: {output_path.stat().st_size} bytes")
-            
-            # Return optimized file
-            result_bytes = BytesIO(output_path.read_bytes())
-            print("✓ File ready for download")
-            
-            return StreamingResponse(
-                result_bytes,
-                media_type="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
-                headers={"Content-Disposition": f'attachment; filename="{return_name}"'}
+            tidy = load_cut_demand(input_file)
+            logger.debug("Data loaded: %d rows", len(tidy))
+        except Exception as load_error:
+            logger.exception("Error loading data")
+            raise HTTPException(status_code=400, detail=f"Data loading error: {load_error}")
+        
+        # Run optimization
+        output_path = optimise_cuts(input_file, kerf=kerf, tidy=tidy)
+        logger.debug("Optimization completed: %s", output_path)
+        
+        if not output_path.exists():
+            logger.error("Output file does not exist: %s", output_path)
+            raise HTTPException(
+                status_code=500, 
+                detail="Optimization failed - no output generated"
             )
-            
-        except Exception as e:
-            # Detailed error for debugging
-            print(f"=== ERROR OCCURRED ===")
-            print(f"Error type: {type(e).__name__}")
-            print(f"Error message: {str(e)}")
-            print(f"Full traceback:\n{traceback.format_exc()}")
-            
-            error_detail = {
-                "error": str(e),
-                "type": type(e).__name__,
-                "trace": traceback.format_exc()
-            }
-            raise HTTPException(status_code=400, detail=error_detail)
+        _cache_put(cache_key, output_path)
+        
+        # Return optimized file straight from disk; the temp dir is removed
+        # once the response has been sent.
+        return FileResponse(
+            str(output_path),
+            media_type=XLSX_MEDIA_TYPE,
+            filename=return_name,
+            background=BackgroundTask(shutil.rmtree, temp_dir, ignore_errors=True),
+        )
+        
+    except HTTPException:
+        shutil.rmtree(temp_dir, ignore_errors=True)
+        raise
+        
+    except Exception as e:
+        shutil.rmtree(temp_dir, ignore_errors=True)
+        # Full traceback stays in the server log; the client only gets the summary
+        logger.exception("Optimization failed")
+        
+        error_detail = {
+            "error": str(e),
+            "type": type(e).__name__,
+        }
+        raise HTTPException(status_code=400, detail=error_detail)
 
 if __name__ == "__main__":
     # Railway will set PORT environment variable
     port = int(os.getenv("PORT", 8080))
-    uvicorn.run("app:app", host="0.0.0.0", port=port)
\ No newline at end of file
+    # Optimisation is CPU-bound, so run one worker per core unless
+    # WEB_CONCURRENCY says otherwise
+    workers = int(os.getenv("WEB_CONCURRENCY", os.cpu_count() or 2))
+    uvicorn.run("app:app", host="0.0.0.0", port=port, workers=workers)
\ No newline at end of file
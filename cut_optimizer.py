@@ -15,49 +15,78 @@ What's new in v2.0
 from __future__ import annotations
 
 import argparse
+import math
+import multiprocessing
+import os
 import sys
+import threading
+import time
+from concurrent.futures import CancelledError, Future, ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
 from datetime import datetime
 from pathlib import Path
+from functools import lru_cache
 from typing import Dict, List, Tuple
-from fractions import Fraction
 
+import numpy as np
 import pandas as pd
 
+try:
+    from ortools.sat.python import cp_model  # type: ignore
+except ModuleNotFoundError:  # solver is optional; fall back to best-fit only
+    cp_model = None
+
 # Local modules
 from cut_sheet_loader import load_cut_demand, STICK_LENGTHS
+from _pack_numba import best_fit_desc
 
 # Default saw blade width, used if not provided.
 DEFAULT_KERF_INCHES: float = 1.0 / 8.0
 
+# Groups larger than this skip the CP-SAT model and use best-fit-decreasing directly.
+MAX_EXACT_PIECES: int = 200
+# Wall-clock cap for a single group's CP-SAT solve.
+SOLVER_TIME_LIMIT_S: float = 0.5
+# Total CP-SAT time per optimise_cuts call; once spent, remaining groups use
+# best-fit-decreasing only.
+SOLVER_TOTAL_BUDGET_S: float = 2.0
+# CP-SAT search threads per solve, in-process or in the pool. Parallelism comes
+# from uvicorn workers, request threads and the group pool, so a solve that
+# claimed every core would oversubscribe the host.
+SOLVER_THREADS: int = 1
+# Groups with fewer pieces than this are optimised in-process, not in the pool.
+PARALLEL_MIN_PIECES: int = 20
+# Size cap for the shared group pool; the web app already runs one uvicorn
+# worker per core, each with its own pool.
+POOL_MAX_WORKERS: int = min(4, os.cpu_count() or 1)
+# Lengths/kerf are scaled to integer thousandths of an inch for CP-SAT.
+_SOLVER_SCALE: int = 1000
+
+_pool: ProcessPoolExecutor | None = None
+_pool_lock = threading.Lock()
+
 
 # ---------------------- helpers ----------------------------------------------
 
-def _fmt_frac(val: float) -> str:
-    """Format decimal inches → nearest 1/16-in string, e.g. 71.6875 → '71 11/16'."""
-    frac = Fraction(val).limit_denominator(16)
-    whole = int(frac)
-    remainder = frac - whole
-    if remainder == 0:
+@lru_cache(maxsize=8192)
+def _fmt_sixteenths(sixteenths: int) -> str:
+    whole, num = divmod(sixteenths, 16)
+    if num == 0:
         return f"{whole}"
+    g = math.gcd(num, 16)
+    frac = f"{num // g}/{16 // g}"
     if whole == 0:
-        return f"{remainder}"
-    return f"{whole} {remainder}"
-
-
-def _first_fit_desc(cuts: List[float], stick_len: int, kerf: float) -> List[Tuple[List[float], float]]:
-    """Simple first-fit-descending bin pack. Returns [(pattern, drop_in), ...]."""
-    bins: List[List[float]] = []
-    for length in sorted(cuts, reverse=True):
-        placed = False
-        for pat in bins:
-            used = sum(pat) + kerf * max(len(pat) - 1, 0)
-            if used + kerf + length <= stick_len:
-                pat.append(length)
-                placed = True
-                break
-        if not placed:
-            bins.append([length])
-    # Calculate drop for each pattern
+        return frac
+    return f"{whole} {frac}"
+
+
+def _fmt_frac(val: float) -> str:
+    """Format decimal inches → nearest 1/16-in string, e.g. 71.6875 → '71 11/16'."""
+    return _fmt_sixteenths(round(val * 16))
+
+
+def _with_drops(bins: List[List[float]], stick_len: float, kerf: float) -> List[Tuple[List[float], float]]:
+    """Attach the leftover drop (in inches) to each packed pattern."""
     final_bins = []
     for pat in bins:
         num_cuts = len(pat)
@@ -68,6 +97,79 @@ def _first_fit_desc(cuts: List[float], stick_len: int, kerf: float) -> List[Tupl
     return final_bins
 
 
+def _optimal_pack(
+    cuts: np.ndarray, stick_len: float, kerf: float, time_limit: float = SOLVER_TIME_LIMIT_S
+) -> List[Tuple[List[float], float]]:
+    """
+    Minimise stick count with a CP-SAT bin-packing model.
+
+    x[i, j] places piece i on stick j, y[j] marks stick j as used. Each used
+    stick must satisfy sum(len) + kerf * (pieces - 1) <= stick_len. The
+    best-fit-decreasing result bounds the number of sticks and is returned
+    whenever the solver is unavailable, the group is too large, the time
+    limit is spent, or no better packing is found.
+    """
+    heuristic = best_fit_desc(cuts, stick_len, kerf)
+    n = len(cuts)
+    if cp_model is None or n > MAX_EXACT_PIECES or len(heuristic) <= 1 or time_limit <= 0:
+        return heuristic
+
+    lengths = np.sort(cuts)[::-1].tolist()
+    # Rounding pieces/kerf up and capacity down keeps every solution feasible.
+    scaled = [math.ceil(l * _SOLVER_SCALE - 1e-6) for l in lengths]
+    s_kerf = math.ceil(kerf * _SOLVER_SCALE - 1e-6)
+    s_cap = math.floor(stick_len * _SOLVER_SCALE + 1e-6)
+    if any(l > s_cap for l in scaled):
+        return heuristic
+
+    n_sticks = len(heuristic)
+    lower_bound = -(-sum(l + s_kerf for l in scaled) // (s_cap + s_kerf))
+    if n_sticks <= lower_bound:
+        return heuristic
+
+    model = cp_model.CpModel()
+    y = [model.NewBoolVar(f"y{j}") for j in range(n_sticks)]
+    # Pieces are sorted, so piece i never needs a stick beyond index i.
+    x = {
+        (i, j): model.NewBoolVar(f"x{i}_{j}")
+        for i in range(n)
+        for j in range(min(i + 1, n_sticks))
+    }
+    for i in range(n):
+        model.AddExactlyOne(x[i, j] for j in range(min(i + 1, n_sticks)))
+    for j in range(n_sticks):
+        # sum(len*x) + kerf*(sum(x) - 1) <= cap*y, rearranged to avoid the -1 on empty sticks
+        model.Add(
+            sum((scaled[i] + s_kerf) * x[i, j] for i in range(j, n)) <= (s_cap + s_kerf) * y[j]
+        )
+        if j:
+            model.Add(y[j] <= y[j - 1])
+    model.Add(sum(y) >= lower_bound)
+    model.Minimize(sum(y))
+
+    solver = cp_model.CpSolver()
+    solver.parameters.max_time_in_seconds = time_limit
+    solver.parameters.num_workers = SOLVER_THREADS
+    status = solver.Solve(model)
+    if status not in (cp_model.OPTIMAL, cp_model.FEASIBLE):
+        return heuristic
+
+    bins: List[List[float]] = [[] for _ in range(n_sticks)]
+    for (i, j), var in x.items():
+        if solver.Value(var):
+            bins[j].append(lengths[i])
+    bins = [pat for pat in bins if pat]
+    if len(bins) >= len(heuristic):
+        return heuristic
+    return _with_drops(bins, stick_len, kerf)
+
+
+def _write_xlsx(df: pd.DataFrame, path: Path) -> None:
+    """Write plain rows with xlsxwriter (much faster than openpyxl; no styling needed)."""
+    with pd.ExcelWriter(path, engine="xlsxwriter") as writer:
+        df.to_excel(writer, index=False)
+
+
 def find_latest_workbook(folder: Path) -> Path:
     workbooks = [p for p in folder.glob("*.xls*") if p.is_file()]
     if not workbooks:
@@ -75,90 +177,177 @@ def find_latest_workbook(folder: Path) -> Path:
     return max(workbooks, key=lambda p: p.stat().st_mtime)
 
 
-def _build_rows(patterns, material, diameter, stick_len, tab):
-    rows = []
-    stick_id = 0
-    for pat, drop in patterns:
-        stick_id += 1
-        rows.append({
-            "Stick_ID": f"{material}-{diameter}-{stick_len}-{stick_id:04d}",
-            "Material": material,
-            "Diameter_in": diameter,
-            "Stick_length_in": stick_len,
-            "Pattern": ", ".join(_fmt_frac(p) for p in pat),
-            "Pieces": len(pat),
-            "Drop_in": drop,
-            "tab": tab
-        })
-    return pd.DataFrame(rows)
+RESULT_COLUMNS: List[str] = [
+    "Stick_ID", "Material", "Diameter_in", "Stick_length_in", "Pattern", "Pieces", "Drop_in", "tab",
+]
+
+
+def _build_columns(patterns, material, diameter, stick_len, tab) -> Dict[str, list]:
+    """One list per output column (see RESULT_COLUMNS), one entry per stick."""
+    n = len(patterns)
+    return {
+        "Stick_ID": [f"{material}-{diameter}-{stick_len}-{i:04d}" for i in range(1, n + 1)],
+        "Material": [material] * n,
+        "Diameter_in": [diameter] * n,
+        "Stick_length_in": [stick_len] * n,
+        "Pattern": [", ".join(_fmt_frac(p) for p in pat) for pat, _ in patterns],
+        "Pieces": [len(pat) for pat, _ in patterns],
+        "Drop_in": [drop for _, drop in patterns],
+        "tab": [tab] * n,
+    }
 
 
 # ---------------------- core group optimise ----------------------------------
 
-def optimise_group(group: pd.DataFrame, material: str, diameter: float, tab: str, kerf: float) -> pd.DataFrame:
-    """Runs the First-Fit-Descending heuristic for a single group of parts."""
+def optimise_group(
+    group: pd.DataFrame,
+    material: str,
+    diameter: float,
+    tab: str,
+    kerf: float,
+    deadline: float | None = None,
+) -> Dict[str, list]:
+    """
+    Packs a single group of parts onto the fewest sticks (CP-SAT, BFD fallback).
+
+    `deadline` is a time.time() timestamp shared by all groups of one run; the
+    solver gets at most SOLVER_TIME_LIMIT_S and never runs past it.
+    """
     try:
         stick_len = STICK_LENGTHS[(material, diameter)]
     except KeyError:
         raise ValueError(f"No stock length defined for Material='{material}', Diameter={diameter}")
 
-    demand = group.groupby("Length")["Qty"].sum().dropna().to_dict()
+    demand = group.groupby("Length", sort=False)["Qty"].sum().dropna()
+
+    # Create a flat float64 array of all cuts required
+    cuts_full = np.repeat(demand.index.to_numpy(dtype=np.float64), demand.to_numpy().astype(np.int64))
 
-    # Create a flat list of all cuts required
-    cuts_full = [l for l, q in demand.items() for _ in range(int(q))]
+    # Run the packing algorithm within this group's share of the solver budget
+    time_limit = SOLVER_TIME_LIMIT_S
+    if deadline is not None:
+        time_limit = min(time_limit, deadline - time.time())
+    patterns = _optimal_pack(cuts_full, stick_len, kerf, time_limit)
 
-    # Run the packing algorithm
-    patterns = _first_fit_desc(cuts_full, stick_len, kerf)
+    # Format the results as output columns
+    return _build_columns(patterns, material, diameter, stick_len, tab)
 
-    # Format the results into a DataFrame
-    return _build_rows(patterns, material, diameter, stick_len, tab)
+
+# ---------------------- worker pool ------------------------------------------
+
+def _get_pool() -> ProcessPoolExecutor:
+    """
+    Return the process pool shared by all optimise_cuts calls, creating it on
+    first use or when a worker has died. Workers start via forkserver: forking
+    a multi-threaded server (request threads, CP-SAT thread pools) could copy
+    held locks into the child.
+    """
+    global _pool
+    with _pool_lock:
+        if _pool is not None and getattr(_pool, "_broken", False):
+            _pool.shutdown(wait=False)
+            _pool = None
+        if _pool is None:
+            _pool = ProcessPoolExecutor(
+                max_workers=POOL_MAX_WORKERS,
+                mp_context=multiprocessing.get_context("forkserver"),
+            )
+        return _pool
+
+
+def _discard_pool(pool: ProcessPoolExecutor) -> None:
+    """
+    Drop a broken pool so the next _get_pool() starts a fresh one. Queued work
+    of concurrent calls is left alone; it fails or finishes with the pool.
+    """
+    global _pool
+    with _pool_lock:
+        if _pool is pool:
+            _pool = None
+    pool.shutdown(wait=False)
 
 
 # ---------------------- orchestrator -----------------------------------------
 
-def optimise_cuts(workbook: Path, kerf: float | None = None) -> Path:
+def optimise_cuts(workbook: Path, kerf: float | None = None, tidy: pd.DataFrame | None = None) -> Path:
     """
     Run optimisation for all (tab, Material, diameter_in) groups and write the result.
 
     Args:
         workbook: Path to the source Excel workbook.
         kerf: Saw blade width in inches. Defaults to 0.125 if not provided.
+        tidy: Demand already loaded with load_cut_demand(workbook); loaded here if omitted.
 
     Returns:
         Path to the actual output file written (Cut_sheet.xlsx or timestamped fallback).
     """
     
     active_kerf = kerf if kerf is not None else DEFAULT_KERF_INCHES
-    tidy = load_cut_demand(workbook)
-
-    outputs = []
-    for (tab, mat, dia), grp in tidy.groupby(["tab", "Material", "diameter_in"]):
+    if tidy is None:
+        tidy = load_cut_demand(workbook)
+
+    # One stable sort up front; groupby then walks contiguous spans in output order
+    keys = ["tab", "Material", "diameter_in"]
+    tidy = tidy.sort_values(keys, kind="mergesort").reset_index(drop=True)
+    groups = list(tidy.groupby(keys, sort=False, observed=True))
+    deadline = time.time() + SOLVER_TOTAL_BUDGET_S
+    is_large = [grp["Qty"].sum() >= PARALLEL_MIN_PIECES for _, grp in groups]
+    pool = _get_pool() if POOL_MAX_WORKERS > 1 and sum(is_large) > 1 else None
+
+    # Large groups are packed in worker processes; small ones aren't worth the
+    # pickling and run here while the pool works.
+    jobs = []
+    for ((tab, mat, dia), grp), large in zip(groups, is_large):
         print(f"Optimising group: {mat} Ø{dia} with kerf={active_kerf}")
+        args = (grp, str(mat).strip(), float(dia), tab, active_kerf, deadline)
+        job = None
+        if pool is not None and large:
+            try:
+                job = pool.submit(optimise_group, *args)
+            except (BrokenProcessPool, RuntimeError):
+                # Pool died or was shut down by another call; run the rest here
+                _discard_pool(pool)
+                pool = None
+        jobs.append((mat, dia, args, job))
+
+    # Groups arrive sorted by (tab, Material, diameter), so the columns
+    # are built in output order
+    columns: Dict[str, list] = {c: [] for c in RESULT_COLUMNS}
+    optimised = 0
+    for mat, dia, args, job in jobs:
         try:
-            result = optimise_group(grp, str(mat).strip(), float(dia), tab, kerf=active_kerf)
-            outputs.append(result)
+            try:
+                result = job.result() if isinstance(job, Future) else optimise_group(*args)
+            except (BrokenProcessPool, CancelledError):
+                # A worker died; replace the pool for later calls, finish this group here
+                if pool is not None:
+                    _discard_pool(pool)
+                result = optimise_group(*args)
         except Exception as exc:
             print(f"Skipping {mat} Ø{dia}: {exc}")
+            continue
+        for c in RESULT_COLUMNS:
+            columns[c].extend(result[c])
+        optimised += 1
 
-    if not outputs:
+    if not optimised:
         raise RuntimeError("No groups optimised – check input data and stock length definitions.")
 
-    result_df = pd.concat(outputs, ignore_index=True)
-    result_df = result_df.sort_values(by=["tab", "Material", "Diameter_in"])
+    result_df = pd.DataFrame(columns)
 
     # --- File Output ---
     out_dir = workbook.parent
     fixed_name = out_dir / "Cut_sheet.xlsx"
 
     try:
-        result_df.to_excel(fixed_name, index=False)
+        _write_xlsx(result_df, fixed_name)
         out_path = fixed_name
         print(f"Cut sheet written to: {out_path}")
     except PermissionError:
         # File is likely open/locked; write a timestamped copy instead
         ts = datetime.now().strftime("%Y%m%d_%H%M%S")
         fallback = out_dir / f"Cut_sheet_{ts}.xlsx"
-        result_df.to_excel(fallback, index=False)
+        _write_xlsx(result_df, fallback)
         out_path = fallback
         print(f"'Cut_sheet.xlsx' was locked. Wrote fallback: {out_path}")
 
@@ -14,15 +14,16 @@ Outputs a tidy DataFrame with:
   ['diameter_in','Material','Qty','Length','tab']
 
 Install deps:
-    python -m pip install pandas openpyxl
+    python -m pip install "pandas>=2.2" python-calamine
 """
 from __future__ import annotations
 
+import re
 import sys
 import types
-from fractions import Fraction
 from pathlib import Path
-from typing import List
+from types import MappingProxyType
+from typing import List, Mapping
 
 # --- sandbox guard for environments that expect 'micropip' -------------------
 if "micropip" not in sys.modules:
@@ -35,7 +36,7 @@ try:
 except ModuleNotFoundError:
     print(
         "\nERROR: The 'pandas' library is required. Install it with:\n"
-        "    python -m pip install pandas openpyxl\n",
+        "    python -m pip install \"pandas>=2.2\" python-calamine\n",
         file=sys.stderr,
     )
     sys.exit(1)
@@ -44,26 +45,28 @@ except ModuleNotFoundError:
 
 KERF_INCHES: float = 1.0 / 8.0  # 0.125 in
 
-STICK_LENGTHS: dict[tuple[str, float], int] = {
-    ("C", 0.375): 20 * 12 - 0.75,
-    ("C", 0.500): 22 * 12 - 0.75,
-    ("C", 0.750): 24 * 12 - 0.75,
-    ("C", 1.000): 24 * 12 - 0.75,
-    ("C", 1.250): 24 * 12 - 0.75,
-    ("C", 1.500): 24 * 12 - 0.75,
-    ("304 PC", 0.375): 20 * 12 - 0.75,
-    ("304 PC", 0.500): 20 * 12 - 0.75,
-    ("304 PC", 0.750): 20 * 12 - 0.75,
-    ("304 PC", 1.000): 20 * 12 - 0.75,
-    ("304 PC", 1.250): 20 * 12 - 0.75,
-    ("304 PC", 1.500): 20 * 12 - 0.75,
-    ("304 OC", 0.375): 20 * 12 - 0.75,
-    ("304 OC", 0.500): 20 * 12 - 0.75,
-    ("304 OC", 0.750): 20 * 12 - 0.75,
-    ("304 OC", 1.000): 20 * 12 - 0.75,
-    ("304 OC", 1.250): 20 * 12 - 0.75,
-    ("304 OC", 1.500): 20 * 12 - 0.75,
-}
+# Usable stick length in inches (nominal feet * 12 - 0.75) by (material, diameter).
+# Read-only; diameters are keyed to 3 decimals, matching load_cut_demand's diameter_in.
+STICK_LENGTHS: Mapping[tuple[str, float], float] = MappingProxyType({
+    ("C", 0.375): 239.25,
+    ("C", 0.500): 263.25,
+    ("C", 0.750): 287.25,
+    ("C", 1.000): 287.25,
+    ("C", 1.250): 287.25,
+    ("C", 1.500): 287.25,
+    ("304 PC", 0.375): 239.25,
+    ("304 PC", 0.500): 239.25,
+    ("304 PC", 0.750): 239.25,
+    ("304 PC", 1.000): 239.25,
+    ("304 PC", 1.250): 239.25,
+    ("304 PC", 1.500): 239.25,
+    ("304 OC", 0.375): 239.25,
+    ("304 OC", 0.500): 239.25,
+    ("304 OC", 0.750): 239.25,
+    ("304 OC", 1.000): 239.25,
+    ("304 OC", 1.250): 239.25,
+    ("304 OC", 1.500): 239.25,
+})
 
 # ----------------------- tabs & parsing helpers -------------------------------
 
@@ -83,6 +86,12 @@ def _norm_material(raw) -> str | None:
         return None
     return s
 
+# optional whole part, then either 'num/den' or a decimal: '3/4', '1 1/4', '1-1/4', '1 0.5'.
+# Stray dashes around the value are separators, not signs ('-3/4' -> 0.75, '5-' -> 5).
+_FRAC_RE = re.compile(
+    r"[\s-]*(?:(\d+)[\s-]+)?(?:(\d+)\s*/\s*(\d+)|(\d*\.?\d+))[\s-]*", re.ASCII
+)
+
 def _to_float_lenient(x) -> float | None:
     """
     Parse numbers in common shop formats:
@@ -91,26 +100,44 @@ def _to_float_lenient(x) -> float | None:
     """
     if x is None or (isinstance(x, float) and pd.isna(x)):
         return None
+    if isinstance(x, (int, float)):
+        return float(x)
     s = (
         str(x)
         .strip()
         .rstrip('"')           # remove inch mark if present
+        .rstrip()
         .replace("–", "-")
         .replace("—", "-")
     )
-    # fast path: plain numeric
+    # fast path: plain decimal with at most one leading minus
+    digits = s[1:] if s[:1] == "-" else s
+    if digits.isascii() and digits.replace(".", "", 1).isdecimal():
+        return float(s)
+    m = _FRAC_RE.fullmatch(s)
+    if m is not None:
+        whole, num, den, dec = m.groups()
+        if num is not None:
+            if float(den) == 0:
+                return None
+            value = float(num) / float(den)
+        else:
+            value = float(dec)
+        return value + float(whole) if whole else value
+    # anything else float() understands, e.g. '1e2'
     try:
         return float(s)
     except ValueError:
-        pass
-    # normalize '1-1/4' -> '1 1/4'
-    s = s.replace("-", " ")
-    try:
-        total = sum(Fraction(p) for p in s.split())
-        return float(total)
-    except Exception:
         return None
 
+def _vec_to_float(s: pd.Series) -> pd.Series:
+    """Column-wise _to_float_lenient: bulk pd.to_numeric, per-cell parsing only for leftovers."""
+    num = pd.to_numeric(s, errors="coerce").astype("float64")
+    mask = num.isna() & s.notna()
+    if mask.any():
+        num.loc[mask] = s.loc[mask].map(_to_float_lenient).astype("float64")
+    return num
+
 def _canonicalize_headers(cols: List[str]) -> List[str]:
     out = []
     for c in cols:
@@ -128,13 +155,12 @@ def _canonicalize_headers(cols: List[str]) -> List[str]:
             out.append(c.strip())
     return out
 
-def _load_one_tab(path: Path, tab: str) -> pd.DataFrame:
+def _load_one_tab(xl: pd.ExcelFile, tab: str) -> pd.DataFrame:
     # Read only BA:BD; assume headers in the first row of that block.
     df = pd.read_excel(
-        path,
+        xl,
         sheet_name=tab,
         usecols="BA:BD",
-        engine="openpyxl",
         dtype={"Diameter_in": object, "Material": object, "Qty": object, "Length": object},
     )
     df.columns = _canonicalize_headers([str(c) for c in df.columns])
@@ -146,16 +172,15 @@ def _load_one_tab(path: Path, tab: str) -> pd.DataFrame:
     # clean types
     df["Material"] = df["Material"].apply(_norm_material)
     df["Qty"] = pd.to_numeric(df["Qty"], errors="coerce")
-    df["Length"] = df["Length"].apply(_to_float_lenient)
-    df["diameter_in"] = df["diameter_in"].apply(_to_float_lenient)
+    df["Length"] = _vec_to_float(df["Length"])
+    # canonical 3-decimal diameter so e.g. 0.7499999 and 0.75 group and look up together
+    df["diameter_in"] = _vec_to_float(df["diameter_in"]).round(3)
 
     # filter invalids
     df = df[df["Material"].notna()]
     df = df[df["Qty"].notna() & (df["Qty"] > 0)]
     df = df[df["Length"].notna() & (df["Length"] > 0)]
     df = df[df["diameter_in"].notna() & (df["diameter_in"] > 0)]
-
-    df["tab"] = tab
     return df
 
 # ----------------------- public API ------------------------------------------
@@ -164,21 +189,31 @@ def load_cut_demand(xls_path: str | Path) -> pd.DataFrame:
     """
     Load BA:BD from each tab and return one tidy DataFrame:
       columns = ['diameter_in','Material','Qty','Length','tab']
+    'tab' is categorical.
     """
     path = Path(xls_path)
     if not path.exists():
         raise FileNotFoundError(path)
 
     frames: List[pd.DataFrame] = []
-    for tab in TABS:
-        try:
-            frames.append(_load_one_tab(path, tab))
-        except Exception as exc:
-            print(f"Warning: failed to load '{tab}': {exc}", file=sys.stderr)
+    loaded: List[str] = []
+    # Open once so the zip directory and shared strings are parsed a single time.
+    with pd.ExcelFile(path, engine="calamine") as xl:
+        for tab in TABS:
+            try:
+                frames.append(_load_one_tab(xl, tab))
+                loaded.append(tab)
+            except Exception as exc:
+                print(f"Warning: failed to load '{tab}': {exc}", file=sys.stderr)
 
     if not frames:
         raise RuntimeError("No tabs could be read. Check tab names and BA:BD headers.")
-    return pd.concat(frames, ignore_index=True)
+    # Tab name comes from the concat keys rather than a per-frame string column
+    out = pd.concat(frames, keys=loaded, names=["tab", None]).reset_index(level="tab")
+    tab = pd.Categorical(out.pop("tab"))
+    out = out.reset_index(drop=True)
+    out["tab"] = tab
+    return out
 
 # ----------------------- CLI / smoke test ------------------------------------
 
@@ -191,4 +226,4 @@ if __name__ == "__main__":
     tidy = load_cut_demand(args.excel)
     print(tidy.head())
     print(f"Rows parsed: {len(tidy)}")
-    print("Per‑tab counts:\n", tidy.groupby("tab")["Qty"].count())
+    print("Per‑tab counts:\n", tidy.groupby("tab", observed=True)["Qty"].count())